@@ -14,13 +14,13 @@
 #  You should have received a copy of the GNU General Public License
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 from numba import prange, njit
-from numpy import atleast_2d, zeros, log, pi, asarray, unique, array, inf, arange
+from numpy import atleast_2d, zeros, log, exp, pi, asarray, unique, array, inf, arange
 
 from ...param import  LParameter, NormalPrior as NP, UniformPrior as UP
 
 
-@njit(parallel=True, cache=False, fastmath=True)
-def lnlike_normal(o, m, e, slices, nids):
+@njit(parallel=True, cache=True, fastmath=True)
+def lnlike_normal(o, m, log10e, slices, nids):
     m = atleast_2d(m)
     slices = atleast_2d(slices)
 
@@ -29,9 +29,14 @@ def lnlike_normal(o, m, e, slices, nids):
     lnl = zeros(npv)
     for i in prange(npv):
         for isl in range(nsl):
-            _e = e[i, nids[isl]]
+            loge = log10e[i, nids[isl]] * log(10.)
+            inv_e2 = exp(-2.0 * loge)
+            ss = 0.0
             for j in range(slices[isl, 0], slices[isl, 1]):
-                lnl[i] += -log(_e) - 0.5 * log(2 * pi) - 0.5 * ((o[j] - m[i, j]) / _e) ** 2
+                d = o[j] - m[i, j]
+                ss += d * d
+            npt = slices[isl, 1] - slices[isl, 0]
+            lnl[i] += -npt * (loge + 0.5 * log(2 * pi)) - 0.5 * ss * inv_e2
     return lnl
 
 class WNLogLikelihood:
@@ -77,5 +82,4 @@ class WNLogLikelihood:
         setattr(self.lpf, f"_start_{name}", self.pv_start)
 
     def __call__(self, pvp, model):
-        e = 10 ** atleast_2d(pvp)[:, self.pv_slice]
-        return lnlike_normal(self.fluxes, model, e, self.lcslices, self.local_pv_noise_ids)
\ No newline at end of file
+        return lnlike_normal(self.fluxes, model, atleast_2d(pvp)[:, self.pv_slice], self.lcslices, self.local_pv_noise_ids)
\ No newline at end of file
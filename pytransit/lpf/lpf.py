@@ -17,13 +17,12 @@
 from pathlib import Path
 from typing import List, Union, Iterable
 
-from astropy.stats import sigma_clip
 from matplotlib.pyplot import subplots, setp
 from numba import njit, prange
-from numpy import (inf, sqrt, ones, zeros_like, concatenate, diff, log, ones_like, all,
+from numpy import (inf, sqrt, ones, zeros_like, concatenate, log, ones_like, all,
                    clip, argsort, any, s_, zeros, arccos, nan, full, pi, sum, repeat, asarray, ndarray, log10,
                    array, atleast_2d, isscalar, atleast_1d, where, isfinite, arange, unique, squeeze, ceil, percentile,
-                   floor, diag, nanstd)
+                   floor, diag, cumsum, split, isnan, median, abs, float64)
 from numpy.random import uniform, normal, permutation, multivariate_normal
 from scipy.stats import norm
 
@@ -43,30 +42,52 @@ from .. import QuadraticModel
 from .logposteriorfunction import LogPosteriorFunction
 
 
-@njit(cache=False)
+@njit(cache=True, fastmath=True)
 def lnlike_normal(o, m, e):
-    return -sum(log(e)) -0.5*o.size*log(2.*pi) - 0.5*sum((o-m)**2/e**2)
+    lnl = -0.5*o.size*log(2.*pi)
+    for j in range(o.size):
+        lnl -= log(e[j])
+    ss = 0.0
+    for j in range(o.size):
+        d = (o[j] - m[j]) / e[j]
+        ss += d*d
+    return lnl - 0.5*ss
 
 
-@njit(cache=False)
+@njit(cache=True, fastmath=True)
 def lnlike_normal_s(o, m, e):
     return -o.size*log(e) -0.5*o.size*log(2.*pi) - 0.5*sum((o-m)**2)/e**2
 
 
-@njit(parallel=True, cache=False, fastmath=True)
+@njit(parallel=True, cache=True, fastmath=True)
 def lnlike_normal_v(o, m, e, wnids, lcids):
     m = atleast_2d(m)
     npv = m.shape[0]
     npt = o.size
+    nk = e.shape[1]
+
+    # The number of datapoints per noise block doesn't depend
+    # on the parameter vector, so we calculate it only once.
+    counts = zeros(nk)
+    for j in range(npt):
+        counts[wnids[lcids[j]]] += 1.
+
     lnl = zeros(npv)
     for i in prange(npv):
+        inv_e2 = zeros(nk)
+        c = -0.5*npt*log(2*pi)
+        for k in range(nk):
+            inv_e2[k] = 1.0 / (e[i,k]*e[i,k])
+            c -= counts[k]*log(e[i,k])
+        ss = 0.0
         for j in range(npt):
-            k = wnids[lcids[j]]
-            lnl[i] += -log(e[i,k]) - 0.5*log(2*pi) - 0.5*((o[j]-m[i,j])/e[i,k])**2
+            d = o[j] - m[i,j]
+            ss += d*d*inv_e2[wnids[lcids[j]]]
+        lnl[i] = c - 0.5*ss
     return lnl
 
 
-@njit(fastmath=True)
+@njit(fastmath=True, cache=True)
 def map_pv(pv):
     pv = atleast_2d(pv)
     pvt = zeros((pv.shape[0], 7))
@@ -77,7 +98,7 @@ def map_pv(pv):
     return pvt
 
 
-@njit(fastmath=True, cache=False)
+@njit(fastmath=True, cache=True)
 def map_ldc(ldc):
     ldc = atleast_2d(ldc)
     uv = zeros_like(ldc)
@@ -87,13 +108,92 @@ def map_ldc(ldc):
     return uv
 
 
+@njit(fastmath=True, cache=True)
+def map_pv_and_ldc(pv, sl_ld_start, sl_ld_stop, pvt_out, uv_out):
+    """Map the parameter vectors to the transit model parameters and limb darkening coefficients.
+
+    Fuses `map_pv` and `map_ldc` into a single pass over the parameter vectors that
+    writes into preallocated arrays without creating any temporaries.
+    """
+    for i in range(pv.shape[0]):
+        pvt_out[i, 0] = sqrt(pv[i, 4])
+        pvt_out[i, 1] = pv[i, 0]
+        pvt_out[i, 2] = pv[i, 1]
+        pvt_out[i, 3] = as_from_rhop(pv[i, 2], pv[i, 1])
+        pvt_out[i, 4] = i_from_ba(pv[i, 3], pvt_out[i, 3])
+        pvt_out[i, 5] = 0.0
+        pvt_out[i, 6] = 0.0
+        for j in range(0, sl_ld_stop - sl_ld_start, 2):
+            a, b = sqrt(pv[i, sl_ld_start + j]), 2. * pv[i, sl_ld_start + j + 1]
+            uv_out[i, j] = a * b
+            uv_out[i, j + 1] = a * (1. - b)
+
+
+@njit(parallel=True, cache=True)
+def _per_lc_wn(fluxes, starts, stops, out):
+    """White noise estimate for each light curve from the point-to-point flux differences.
+
+    Equivalent to `nanstd(diff(f)) / sqrt(2)` for each light curve slice, but calculated
+    with a single pass over the concatenated flux array.
+    """
+    for i in prange(starts.size):
+        n, mean, m2 = 0, 0.0, 0.0
+        for k in range(starts[i], stops[i] - 1):
+            d = fluxes[k + 1] - fluxes[k]
+            if not isnan(d):
+                n += 1
+                delta = d - mean
+                mean += delta / n
+                m2 += delta * (d - mean)
+        out[i] = sqrt(m2 / n / 2.) if n > 0 else nan
+    return out
+
+
+@njit(parallel=True, cache=True)
+def sigma_clip_per_lc(res, starts, stops, sigma, maxiter, mask):
+    """Iterative median-centred sigma clipping done separately for each light curve.
+
+    Follows `astropy.stats.sigma_clip` with the median as the centre and the standard deviation
+    as the scale, but clips all the light curves of the concatenated residual array in a single call.
+
+    Parameters
+    ----------
+    res: ndarray
+        Concatenated residuals.
+    starts: ndarray
+        Light curve start indices.
+    stops: ndarray
+        Light curve stop indices.
+    sigma: float
+        Clipping limit in standard deviations.
+    maxiter: int
+        Maximum number of clipping iterations.
+    mask: ndarray
+        Output boolean array set to True for the points that are kept.
+    """
+    for i in prange(starts.size):
+        r = res[starts[i]:stops[i]]
+        m = isfinite(r)
+        for iteration in range(maxiter):
+            x = r[m]
+            if x.size == 0:
+                break
+            limit = sigma * x.std()
+            mn = m & (abs(r - median(x)) <= limit)
+            if mn.sum() == m.sum():
+                break
+            m = mn
+        mask[starts[i]:stops[i]] = m
+    return mask
+
+
 class BaseLPF(LogPosteriorFunction):
     _lpf_name = 'BaseLPF'
 
     def __init__(self, name: str, passbands: list, times: list = None, fluxes: Iterable = None, errors: list = None,
                  pbids: list = None, covariates: list = None, wnids: list = None, tm: TransitModel = None,
                  nsamples: tuple = 1, exptimes: tuple = 0., init_data=True, result_dir: Path = None, tref: float = 0.0,
-                 lnlikelihood: str = 'wn'):
+                 lnlikelihood: str = 'wn', dtype=float64):
         """The base Log Posterior Function class.
 
         The `BaseLPF` class creates the basis for transit light curve analyses using `PyTransit`. This class can be
@@ -142,6 +242,11 @@ class BaseLPF(LogPosteriorFunction):
 
         tref: float, optional
             Reference time
+
+        dtype: numpy dtype, optional
+            Data type for the stored observed fluxes, their uncertainties, and the covariates. Using `float32`
+            halves the memory used by these arrays. The times, the flux model, and the likelihood evaluation
+            are always in double precision.
         """
 
         self._pre_initialisation()
@@ -150,6 +255,7 @@ class BaseLPF(LogPosteriorFunction):
 
         self.tm = tm or QuadraticModel(klims=(0.01, 0.75), nk=512, nz=512)
         self._tref = tref
+        self.dtype = dtype
 
         # Passbands
         # ---------
@@ -195,6 +301,9 @@ class BaseLPF(LogPosteriorFunction):
         self.pbids: ndarray = None       # Array of passband indices for each light curve
         self.lcslices: list = None       # List of light curve slices
 
+        self._pvt_scratch: ndarray = None   # Scratch array for the mapped transit model parameters
+        self._uv_scratch: ndarray = None    # Scratch array for the mapped limb darkening coefficients
+
         if init_data:
             # Set up the observation data
             # ---------------------------
@@ -231,13 +340,23 @@ class BaseLPF(LogPosteriorFunction):
             self.pbids = atleast_1d(pbids).astype('int')
 
         self.nlc = len(times)
-        self.times = times
-        self.fluxes = fluxes
-        self.wn = [nanstd(diff(f)) / sqrt(2) for f in fluxes]
-        self.timea = concatenate(self.times)
-        self.ofluxa = concatenate(self.fluxes)
+        self.timea = concatenate(times)
+        self.ofluxa = concatenate(fluxes).astype(self.dtype)
         self.mfluxa = zeros_like(self.ofluxa)
-        self.lcids = concatenate([full(t.size, i) for i, t in enumerate(self.times)])
+        sizes = array([t.size for t in times])
+        self.lcids = repeat(arange(self.nlc), sizes)
+
+        # Initialise the light curves slices
+        # ----------------------------------
+        starts = concatenate([[0], sizes.cumsum()])
+        self.lcslices = [s_[starts[i]:starts[i + 1]] for i in range(self.nlc)]
+
+        # The per-light-curve arrays are views into the concatenated arrays
+        # -----------------------------------------------------------------
+        self.times = [self.timea[sl] for sl in self.lcslices]
+        self.fluxes = [self.ofluxa[sl] for sl in self.lcslices]
+        self.wn = _per_lc_wn(self.ofluxa, array([sl.start for sl in self.lcslices]),
+                             array([sl.stop for sl in self.lcslices]), zeros(self.nlc))
 
         # TODO: Noise IDs get scrambled when removing transits, fix!!!
         if wnids is None:
@@ -261,26 +380,16 @@ class BaseLPF(LogPosteriorFunction):
         self.tm.set_data(self.timea-self._tref, self.lcids, self.pbids, self.nsamples, self.exptimes)
 
         if errors is None:
-            self.errors = array([full(t.size, nan) for t in self.times])
+            self.errora = full(self.timea.size, nan, self.dtype)
         else:
-            self.errors = asarray(errors)
-        self.errora = concatenate(self.errors)
-
-        # Initialise the light curves slices
-        # ----------------------------------
-        self.lcslices = []
-        sstart = 0
-        for i in range(self.nlc):
-            s = self.times[i].size
-            self.lcslices.append(s_[sstart:sstart + s])
-            sstart += s
+            self.errora = concatenate(errors).astype(self.dtype)
+        self.errors = [self.errora[sl] for sl in self.lcslices]
 
         # Initialise the covariate arrays, if given
         # -----------------------------------------
         if covariates is not None:
-            self.covariates = covariates
-            for cv in self.covariates:
-                cv = (cv - cv.mean(0)) / cv.std(0)
+            self.covariates = [((cv - cv.mean(0)) / where(cv.std(0) > 0., cv.std(0), 1.)).astype(self.dtype)
+                               for cv in covariates]
             #self.ncovs = self.covariates[0].shape[1]
             #self.covsize = array([c.size for c in self.covariates])
             #self.covstart = concatenate([[0], self.covsize.cumsum()[:-1]])
@@ -377,11 +486,11 @@ class BaseLPF(LogPosteriorFunction):
         # red passbands.
         #
         else:
-            ldsl = self._sl_ld
-            for i in range(pvp.shape[0]):
-                pid = argsort(pvp[i, ldsl][::2])[::-1]
-                pvp[i, ldsl][::2] = pvp[i, ldsl][::2][pid]
-                pvp[i, ldsl][1::2] = pvp[i, ldsl][1::2][pid]
+            ldc = pvp[:, self._sl_ld]
+            q1, q2 = ldc[:, ::2], ldc[:, 1::2]
+            pid = argsort(-q1, axis=1)
+            rows = arange(pvp.shape[0])[:, None]
+            ldc[:, ::2], ldc[:, 1::2] = q1[rows, pid], q2[rows, pid]
 
         return pvp
 
@@ -406,19 +515,29 @@ class BaseLPF(LogPosteriorFunction):
 
     def transit_model(self, pv, copy=True):
         pv = atleast_2d(pv)
-        ldc = map_ldc(pv[:,self._sl_ld])
-        zero_epoch = pv[:,0] - self._tref
-        period = pv[:,1]
-        smaxis = as_from_rhop(pv[:,2], period)
-        inclination  = i_from_ba(pv[:,3], smaxis)
-        radius_ratio = sqrt(pv[:,4:5])
-        return self.tm.evaluate(radius_ratio, ldc, zero_epoch, period, smaxis, inclination)
+        ldstart, ldstop = self._sl_ld.start, self._sl_ld.stop
+        if self._pvt_scratch is None or self._pvt_scratch.shape[0] != pv.shape[0]:
+            self._pvt_scratch = zeros((pv.shape[0], 7))
+            self._uv_scratch = zeros((pv.shape[0], ldstop - ldstart))
+        pvt, ldc = self._pvt_scratch, self._uv_scratch
+        map_pv_and_ldc(pv, ldstart, ldstop, pvt, ldc)
+        return self.tm.evaluate(pvt[:, 0:1], ldc, pvt[:, 1] - self._tref, pvt[:, 2], pvt[:, 3], pvt[:, 4], copy=copy)
 
     def flux_model(self, pv):
         baseline    = self.baseline(pv)
         trends      = self.trends(pv)
         model_flux = self.transit_model(pv)
-        return baseline * model_flux + trends
+
+        # Skip the full-size temporaries when there is no baseline or trend model. Models that
+        # return a view into their output buffer need a copy so that the next call does not
+        # overwrite the result.
+        if isscalar(baseline) and baseline == 1. and isscalar(trends) and trends == 0.:
+            if self.tm.returns_buffer_view:
+                return model_flux.copy()
+            else:
+                return model_flux
+        else:
+            return baseline * model_flux + trends
 
     def residuals(self, pv):
         return self.ofluxa - self.flux_model(pv)
@@ -518,29 +637,46 @@ class BaseLPF(LogPosteriorFunction):
 
     def remove_outliers(self, sigma=5):
         fmodel = squeeze(self.flux_model(self.de.minimum_location))
-        covariates = [] if self.covariates is not None else None
-        times, fluxes, lcids, errors = [], [], [], []
-        for i in range(len(self.times)):
-            res = self.fluxes[i] - fmodel[self.lcslices[i]]
-            mask = ~sigma_clip(res, sigma=sigma).mask
-            times.append(self.times[i][mask])
-            fluxes.append(self.fluxes[i][mask])
-            if covariates is not None:
-                covariates.append(self.covariates[i][mask])
-            if self.errors is not None:
-                errors.append(self.errors[i][mask])
-
-        self._init_data(times=times, fluxes=fluxes, covariates=self.covariates, pbids=self.pbids,
-                        errors=(errors if self.errors is not None else None), wnids=self.noise_ids,
-                        nsamples=self.nsamples, exptimes=self.exptimes)
+        res = self.ofluxa - fmodel
+        mask = sigma_clip_per_lc(res, array([sl.start for sl in self.lcslices]),
+                                 array([sl.stop for sl in self.lcslices]), sigma, 5, ones(res.size, bool))
+
+        # Split the masked concatenated arrays back into per-light-curve views
+        # --------------------------------------------------------------------
+        splits = cumsum([mask[sl].sum() for sl in self.lcslices])[:-1]
+        times = split(self.timea[mask], splits)
+        fluxes = split(self.ofluxa[mask], splits)
+        errors = split(self.errora[mask], splits)
+        if self.covariates is not None:
+            covariates = [cv[mask[sl]] for cv, sl in zip(self.covariates, self.lcslices)]
+        else:
+            covariates = None
+
+        self._init_data(times=times, fluxes=fluxes, covariates=covariates, pbids=self.pbids,
+                        errors=errors, wnids=self.noise_ids, nsamples=self.nsamples, exptimes=self.exptimes)
+        self._reinit_models()
 
     def remove_transits(self, tids):
-        m = ones(len(self.times), bool)
+        m = ones(self.nlc, bool)
         m[tids] = False
-        self._init_data(self.times[m], self.fluxes[m], self.pbids[m],
-                        self.covariates[m] if self.covariates is not None else None,
-                        self.errors[m], self.noise_ids[m], self.nsamples[m], self.exptimes[m])
+        keep = where(m)[0]
+        noise_ids = unique(self.noise_ids[m], return_inverse=True)[1]
+        self._init_data([self.times[i] for i in keep], [self.fluxes[i] for i in keep], self.pbids[m],
+                        [self.covariates[i] for i in keep] if self.covariates is not None else None,
+                        [self.errors[i] for i in keep], noise_ids, self.nsamples[m], self.exptimes[m])
+        self._reinit_models()
+
+    def _reinit_models(self):
+        """Recreate the parametrisation and the likelihood and baseline models after a data change.
+
+        The likelihood and baseline models store the data slices and add their own
+        parameter blocks, so they need to be recreated whenever the data changes.
+        """
         self._init_parameters()
+        self._lnlikelihood_models = []
+        self._baseline_models = []
+        self._init_lnlikelihood()
+        self._init_baseline()
 
     def posterior_samples(self, burn: int = 0, thin: int = 1, derived_parameters: bool = True):
         df = super().posterior_samples(burn=burn, thin=thin)
@@ -60,6 +60,8 @@ class QuadraticModelCL(TransitModel):
 
     """
 
+    returns_buffer_view = True
+
     def __init__(self, klims: tuple = (0.05, 0.25), nk: int = 256, nz: int = 256, cl_ctx=None, cl_queue=None) -> None:
         """Transit model with quadratic limb darkening (Mandel & Agol, ApJ 580, L171-L175, 2002).
 
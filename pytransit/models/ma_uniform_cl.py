@@ -47,6 +47,8 @@ class UniformModelCL(TransitModel):
     """Exoplanet transit over a uniform disk (Mandel & Agol, ApJ 580, L171-L175 2002).
     """
 
+    returns_buffer_view = True
+
     def __init__(self, cl_ctx=None, cl_queue=None) -> None:
         super().__init__()
 
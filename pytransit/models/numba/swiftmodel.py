@@ -14,8 +14,8 @@
 #  You should have received a copy of the GNU General Public License
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 from numba import njit, prange
-from numpy import arccos, sqrt, linspace, zeros, arange, dot, floor, pi, ndarray, atleast_1d, atleast_2d, isnan, inf, \
-    atleast_3d, nan
+from numpy import arccos, arctan2, sqrt, linspace, zeros, arange, dot, pi, ndarray, isnan, inf, nan, searchsorted, \
+    copysign
 
 from pytransit.orbits.orbits_py import z_ip_s, z_ip_v
 
@@ -31,27 +31,53 @@ def circle_circle_intersection_area(r1, r2, b):
     elif b - r2 <= -r1:
         return pi * r1 ** 2
     else:
-        return (r2 ** 2 * arccos((b ** 2 + r2 ** 2 - r1 ** 2) / (2 * b * r2)) +
-                r1 ** 2 * arccos((b ** 2 + r1 ** 2 - r2 ** 2) / (2 * b * r1)) -
-                0.5 * sqrt((-b + r2 + r1) * (b + r2 - r1) * (b - r2 + r1) * (b + r2 + r1)))
+        # x is the distance from the centre of the first circle to the common chord
+        # and h the half-length of the chord, so that the half-angles subtended by the
+        # chord are atan2(h, x) and atan2(h, b - x) and the area of the kite is b*h.
+        r1s = r1 * r1
+        x = 0.5 * (b * b + r1s - r2 * r2) / b
+        h = sqrt(max(r1s - x * x, 0.0))
+        return r1s * arctan2(h, x) + r2 * r2 * arctan2(h, b - x) - b * h
 
 
-@njit
+@njit(inline='always', fastmath=True)
+def circle_circle_intersection_area_kz(k, k2, z):
+    """Area of the intersection of the unit stellar disk and a planet with radius k at distance z.
+
+    A specialised version of `circle_circle_intersection_area` for r1 = 1 taking
+    the squared radius ratio k2 = k*k precomputed by the caller.
+    """
+    if z - k > 1.0:
+        return 0.0
+    elif z + k <= 1.0:
+        return pi * k2
+    elif z - k <= -1.0:
+        return pi
+    else:
+        x = 0.5 * (z * z + 1.0 - k2) / z
+        h = sqrt(max(1.0 - x * x, 0.0))
+        return arctan2(h, x) + k2 * arctan2(h, z - x) - z * h
+
+
+@njit(fastmath=True)
 def circle_circle_intersection_area_v(r1, r2, bs):
     """Area of the intersection of two circles.
     """
+    r1s, r2s = r1 * r1, r2 * r2
+    a_r1, a_r2 = pi * r1s, pi * r2s
     a = zeros(bs.size)
     for i in range(bs.size):
         b = bs[i]
         if r1 < b - r2:
             a[i] = 0.0
         elif r1 >= b + r2:
-            a[i] = pi * r2 ** 2
+            a[i] = a_r2
         elif b - r2 <= -r1:
-            a[i] = pi * r1 ** 2
+            a[i] = a_r1
         else:
-            a[i] = (r2 ** 2 * arccos((b ** 2 + r2 ** 2 - r1 ** 2) / (2 * b * r2)) +
-                    r1 ** 2 * arccos((b ** 2 + r1 ** 2 - r2 ** 2) / (2 * b * r1)) -
+            b2 = b * b
+            a[i] = (r2s * arccos((b2 + r2s - r1s) / (2 * b * r2)) +
+                    r1s * arccos((b2 + r1s - r2s) / (2 * b * r1)) -
                     0.5 * sqrt((-b + r2 + r1) * (b + r2 - r1) * (b - r2 + r1) * (b + r2 + r1)))
     return a
 
@@ -85,6 +111,42 @@ def create_z_grid_acos(nz: int):
     return z_edges, z_means
 
 
+@njit
+def calculate_weights_row(k: float, b: float, ze: ndarray, weights: ndarray):
+    """Calculate the normalized limb darkening weights for a single planet-star separation.
+
+    The planet covers none of the annuli with outer edges ze < b - k, and the whole planet is
+    covered by the annuli with ze >= b + k. We locate these two edges with binary searches and
+    evaluate the circle-circle intersection area only for the partially covered annuli between them.
+
+    Parameters
+    ----------
+    k: float
+        Radius ratio
+    b: float
+        Planet-star center separation
+    ze: ndarray
+        Annulus outer edges
+    weights: ndarray
+        Zero-initialised output array with the same size as `ze`
+    """
+    nz = ze.size
+    i0 = searchsorted(ze, b - k)
+    i1 = searchsorted(ze, b + k)
+    i2 = min(i1 + 1, nz)
+    afull = pi * k ** 2
+
+    # The differences telescope, so the sum of the weights is the last cumulative area.
+    a0 = 0.0
+    for i in range(i0, i2):
+        a1 = afull if i >= i1 else circle_circle_intersection_area(ze[i], k, b)
+        weights[i] = a1 - a0
+        a0 = a1
+    inv_s = 1.0 / a0
+    for i in range(i0, i2):
+        weights[i] *= inv_s
+
+
 @njit
 def calculate_weights_2d(k: float, ze: ndarray, ng: int):
     """Calculate a 2D limb darkening weight array.
@@ -107,17 +169,7 @@ def calculate_weights_2d(k: float, ze: ndarray, ng: int):
     weights = zeros((ng, nz))
 
     for ig in range(ng):
-        b = gs[ig] * (1.0 + k)
-        a0 = circle_circle_intersection_area(ze[0], k, b)
-        weights[ig, 0] = a0
-        s = weights[ig, 0]
-        for i in range(1, nz):
-            a1 = circle_circle_intersection_area(ze[i], k, b)
-            weights[ig, i] = a1 - a0
-            a0 = a1
-            s += weights[ig, i]
-        for i in range(nz):
-            weights[ig, i] /= s
+        calculate_weights_row(k, gs[ig] * (1.0 + k), ze, weights[ig])
     return gs, gs[1] - gs[0], weights
 
 
@@ -145,20 +197,50 @@ def calculate_weights_3d(nk: int, k0: float, k1: float, ze: ndarray, ng: int):
 
     for ik in range(nk):
         for ig in range(ng):
-            b = gs[ig] * (1.0 + ks[ik])
-            a0 = circle_circle_intersection_area(ze[0], ks[ik], b)
-            weights[ik, ig, 0] = a0
-            s = weights[ik, ig, 0]
-            for i in range(1, nz):
-                a1 = circle_circle_intersection_area(ze[i], ks[ik], b)
-                weights[ik, ig, i] = a1 - a0
-                a0 = a1
-                s += weights[ik, ig, i]
-            for i in range(nz):
-                weights[ik, ig, i] /= s
+            calculate_weights_row(ks[ik], gs[ig] * (1.0 + ks[ik]), ze, weights[ik, ig])
     return (k1-k0)/nk, gs[1] - gs[0], weights
 
 
+@njit(fastmath=True)
+def find_z_index(z, mz, guess):
+    """Find the grid interval containing z.
+
+    Returns the index i for which mz[i] <= z <= mz[i+1]. The intervals next to the
+    guess are checked first, and a binary search is used if none of them contain z.
+
+    Parameters
+    ----------
+    z: float
+        Normalized distance, must satisfy mz[0] <= z <= mz[-1]
+    mz: ndarray
+        Sorted normalized distance grid
+    guess: int
+        Initial guess for the index, -1 if no guess is available
+
+    Returns
+    -------
+    int
+    """
+    n = mz.size
+    if 0 <= guess < n - 1:
+        if mz[guess] <= z:
+            if z <= mz[guess + 1]:
+                return guess
+            elif guess < n - 2 and z <= mz[guess + 2]:
+                return guess + 1
+        elif guess > 0 and mz[guess - 1] <= z:
+            return guess - 1
+
+    lo, hi = 0, n - 1
+    while hi - lo > 1:
+        m = (lo + hi) >> 1
+        if mz[m] <= z:
+            lo = m
+        else:
+            hi = m
+    return lo
+
+
 @njit(fastmath=True)
 def interpolate_limb_darkening_s(z, mz, ldp):
     if z < 0.0:
@@ -166,14 +248,7 @@ def interpolate_limb_darkening_s(z, mz, ldp):
     if z > mz[-1]:
         return ldp[-1]
 
-    i = mz.size // 2
-    if z > mz[i]:
-        while z > mz[i + 1]:
-            i += 1
-    else:
-        while z < mz[i]:
-            i -= 1
-
+    i = find_z_index(z, mz, -1)
     a = (z - mz[i]) / (mz[i + 1] - mz[i])
     return (1.0 - a) * ldp[i] + a * ldp[i + 1]
 
@@ -183,6 +258,7 @@ def interpolate_limb_darkening_v(zs, mz, ldp):
     nz = zs.size
     ld = zeros(nz)
 
+    i = -1
     for iz in range(nz):
         z = zs[iz]
         if z < 0.0:
@@ -192,14 +268,9 @@ def interpolate_limb_darkening_v(zs, mz, ldp):
             ld[iz] = ldp[-1]
             continue
 
-        i = mz.size // 2
-        if z > mz[i]:
-            while z > mz[i + 1]:
-                i += 1
-        else:
-            while z < mz[i]:
-                i -= 1
-
+        # The z values of a light curve change smoothly, so the previous
+        # interval is a good guess for the current one.
+        i = find_z_index(z, mz, i)
         a = (z - mz[i]) / (mz[i + 1] - mz[i])
         ld[iz] = (1.0 - a) * ldp[i] + a * ldp[i + 1]
     return ld
@@ -211,7 +282,7 @@ def lerp(g, dg, ldw):
         return 0.0
     else:
         ng = g / dg
-        ig = int(floor(ng))
+        ig = int(ng)
         ag = ng - ig
         return (1.0 - ag) * ldw[ig] + ag * ldw[ig+1]
 
@@ -238,7 +309,7 @@ def im_p_s(g: float, dg, weights, ldp):
         return 0.0
     else:
         ng = g / dg
-        ig = int(floor(ng))
+        ig = int(ng)
         ag = ng - ig
         return (1.0 - ag) * dot(weights[ig], ldp) + ag * dot(weights[ig + 1], ldp)
 
@@ -249,12 +320,12 @@ def im_p_s_3d(k: float, g: float, dk, dg, weights, ldp, k0):
         return 0.0
     else:
         nk = (k - k0) / dg
-        ik = int(floor(nk))
+        ik = int(nk)
         ak1 = nk - ik
         ak2 = 1.0 - ak1
 
         ng = g / dg
-        ig = int(floor(ng))
+        ig = int(ng)
         ag1 = ng - ig
         ag2 = 1.0 - ag1
 
@@ -294,7 +365,7 @@ def im_p_v(gs, dg, weights, ldp):
             im[i] = 0.0
         else:
             ng = gs[i] / dg
-            ig = int(floor(ng))
+            ig = int(ng)
             ag = ng - ig
             im[i] = (1.0 - ag) * ldw[ig] + ag * ldw[ig + 1]
     return im
@@ -325,7 +396,7 @@ def im_p_v2(gs, dg, ldw):
             im[i] = 0.0
         else:
             ng = gs[i] / dg
-            ig = int(floor(ng))
+            ig = int(ng)
             ag = ng - ig
             im[i] = (1.0 - ag) * ldw[ig] + ag * ldw[ig + 1]
     return im
@@ -336,43 +407,55 @@ def swmodel_z_direct_parallel(z, k, istar, ng, ldp, ze):
     flux = zeros(z.size)
     gs, dg, weights = calculate_weights_2d(k, ze, ng)
     ldw = dot(weights, ldp)
+    ztog = 1. / (1. + k)
+    k2 = k * k
     for i in prange(z.size):
-        iplanet = lerp(z[i] / (1. + k), dg, ldw)
-        aplanet = circle_circle_intersection_area(1.0, k, z[i])
+        iplanet = lerp(z[i] * ztog, dg, ldw)
+        aplanet = circle_circle_intersection_area_kz(k, k2, z[i])
         flux[i] = (istar - iplanet * aplanet) / istar
     return flux
 
 @njit
 def swmodel_z_direct_serial(z, k, istar, ng, ldp, ze):
+    flux = zeros(z.size)
     gs, dg, weights = calculate_weights_2d(k, ze, ng)
+    ldw = dot(weights, ldp)
     ztog = 1. / (1. + k)
-    iplanet = im_p_v(z*ztog, dg, weights, ldp)
-    aplanet = circle_circle_intersection_area_v(1.0, k, z)
-    return (istar - iplanet * aplanet) / istar
+    k2 = k * k
+    for i in range(z.size):
+        iplanet = lerp(z[i] * ztog, dg, ldw)
+        aplanet = circle_circle_intersection_area_kz(k, k2, z[i])
+        flux[i] = (istar - iplanet * aplanet) / istar
+    return flux
 
 @njit
 def swmodel_z_interpolated_serial(z, k, istar, ldp, weights, dk, k0, dg):
+    flux = zeros(z.size)
     nk = (k - k0) / dk
-    ik = int(floor(nk))
+    ik = int(nk)
     ak = nk - ik
     ldw = (1.0 - ak) * dot(weights[ik], ldp) + ak * dot(weights[ik + 1], ldp)
     ztog = 1. / (1. + k)
-    iplanet = im_p_v2(z*ztog, dg, ldw)
-    aplanet = circle_circle_intersection_area_v(1.0, k, z)
-    return (istar - iplanet * aplanet) / istar
+    k2 = k * k
+    for i in range(z.size):
+        iplanet = lerp(z[i] * ztog, dg, ldw)
+        aplanet = circle_circle_intersection_area_kz(k, k2, z[i])
+        flux[i] = (istar - iplanet * aplanet) / istar
+    return flux
 
 
 @njit(parallel=True)
 def swmodel_z_interpolated_parallel(z, k, istar, ldp, weights, dk, k0, dg):
     flux = zeros(z.size)
     nk = (k - k0) / dk
-    ik = int(floor(nk))
+    ik = int(nk)
     ak = nk - ik
     ldw = (1.0 - ak) * dot(weights[ik], ldp) + ak * dot(weights[ik + 1], ldp)
     ztog = 1. / (1. + k)
+    k2 = k * k
     for i in prange(z.size):
         iplanet = lerp(z[i]*ztog, dg, ldw)
-        aplanet = circle_circle_intersection_area(1.0, k, z[i])
+        aplanet = circle_circle_intersection_area_kz(k, k2, z[i])
         flux[i] = (istar - iplanet * aplanet) / istar
     return flux
 
@@ -384,7 +467,6 @@ def swmodel_direct_s_simple(t, k, t0, p, a, i, e, w, ldp, istar, ze, zm, ng, spl
     This version avoids the overheads from threading and supersampling. The fastest option if the number of datapoints
     is smaller than some thousands.
     """
-    k = atleast_1d(k)
     z = z_ip_v(t, t0, p, a, i, e, w, es, ms, tae)
 
     # Swift model branch
@@ -401,6 +483,7 @@ def swmodel_direct_s_simple(t, k, t0, p, a, i, e, w, ldp, istar, ze, zm, ng, spl
 
     aplanet = circle_circle_intersection_area_v(1.0, k[0], z)
     flux = (istar[0,0] - iplanet * aplanet) / istar[0,0]
+    flux[copysign(1., z) < 0.0] = 1.0
     return flux
 
 @njit(parallel=False, fastmath=True)
@@ -408,24 +491,43 @@ def _eval_s_serial(t, k, t0, p, a, i, e, w, istar, zm, dg, ldp, ldw, splimit, lc
     npt = t.size
     flux = zeros(npt)
 
-    for j in range(npt):
+    # The points are processed in runs of consecutive points sharing the same light curve
+    # so that the light curve and passband dependent quantities need to be set up only once
+    # per run. The light curves are usually stored contiguously, so there are few runs.
+    j = 0
+    while j < npt:
         ilc = lcids[j]
         ipb = pbids[ilc]
         _k = k[0] if k.size == 1 else k[ipb]
 
-        for isample in range(1, nsamples[ilc] + 1):
-            time_offset = exptimes[ilc] * ((isample - 0.5) / nsamples[ilc] - 0.5)
-            z = z_ip_s(t[j] + time_offset, t0, p, a, i, e, w, es, ms, tae)
-            if z > 1.0 + _k:
-                flux[j] += 1.
-            else:
-                if _k > splimit:
-                    iplanet = lerp(z / (1. + _k), dg, ldw[ipb])
+        ns = nsamples[ilc]
+        inv_ns = 1.0 / ns
+        dt = exptimes[ilc] * inv_ns
+        hexp = 0.5 * exptimes[ilc]
+        ztog = 1.0 / (1.0 + _k)
+        k2 = _k * _k
+        _istar = istar[0, ipb]
+        inv_istar = 1.0 / _istar
+        ldwp = ldw[ipb]
+        ldpp = ldp[0, ipb]
+        use_swift = _k > splimit
+
+        while j < npt and lcids[j] == ilc:
+            t_start = t[j] - hexp
+            for isample in range(1, ns + 1):
+                z = z_ip_s(t_start + dt * (isample - 0.5), t0, p, a, i, e, w, es, ms, tae)
+                g = z * ztog
+                if copysign(1., z) < 0.0 or g >= 1.0:
+                    flux[j] += 1.
                 else:
-                    iplanet = interpolate_limb_darkening_s(z, zm, ldp[0,ipb])
-                aplanet = circle_circle_intersection_area(1.0, _k, z)
-                flux[j] += (istar[0,ipb] - iplanet * aplanet) / istar[0,ipb]
-        flux[j] /= nsamples[ilc]
+                    if use_swift:
+                        iplanet = lerp(g, dg, ldwp)
+                    else:
+                        iplanet = interpolate_limb_darkening_s(z, zm, ldpp)
+                    aplanet = circle_circle_intersection_area_kz(_k, k2, z)
+                    flux[j] += (_istar - iplanet * aplanet) * inv_istar
+            flux[j] *= inv_ns
+            j += 1
     return flux
 
 
@@ -439,31 +541,34 @@ def _eval_s_parallel(t, k, t0, p, a, i, e, w, istar, zm, dg, ldp, ldw, splimit,
         ipb = pbids[ilc]
         _k = k[0] if k.size == 1 else k[ipb]
 
+        inv_ns = 1.0 / nsamples[ilc]
+        dt = exptimes[ilc] * inv_ns
+        t_start = t[j] - 0.5 * exptimes[ilc]
+        ztog = 1.0 / (1.0 + _k)
+        k2 = _k * _k
+        inv_istar = 1.0 / istar[0, ipb]
+
         for isample in range(1, nsamples[ilc] + 1):
-            time_offset = exptimes[ilc] * ((isample - 0.5) / nsamples[ilc] - 0.5)
-            z = z_ip_s(t[j] + time_offset, t0, p, a, i, e, w, es, ms, tae)
-            if z > 1.0 + _k:
+            z = z_ip_s(t_start + dt * (isample - 0.5), t0, p, a, i, e, w, es, ms, tae)
+            g = z * ztog
+            if copysign(1., z) < 0.0 or g >= 1.0:
                 flux[j] += 1.
             else:
                 if _k > splimit:
-                    iplanet = lerp(z / (1. + _k), dg, ldw[ipb])
+                    iplanet = lerp(g, dg, ldw[ipb])
                 else:
                     iplanet = interpolate_limb_darkening_s(z, zm, ldp[0,ipb])
-                aplanet = circle_circle_intersection_area(1.0, _k, z)
-                flux[j] += (istar[0,ipb] - iplanet * aplanet) / istar[0,ipb]
-        flux[j] /= nsamples[ilc]
+                aplanet = circle_circle_intersection_area_kz(_k, k2, z)
+                flux[j] += (istar[0,ipb] - iplanet * aplanet) * inv_istar
+        flux[j] *= inv_ns
     return flux
 
 
 @njit
 def swmodel_direct_s(t, k, t0, p, a, i, e, w, ldp, istar, ze, zm, ng, splimit, lcids, pbids, nsamples, exptimes, es, ms, tae, parallel):
-    k = atleast_1d(k)
-    npb = ldp.shape[1]
     gs, dg, weights = calculate_weights_2d(k[0], ze, ng)
 
-    ldw = zeros((npb, ng))
-    for ipb in range(npb):
-        ldw[ipb] = dot(weights, ldp[0, ipb])
+    ldw = dot(ldp[0], weights.T)
 
     if parallel:
         return _eval_s_parallel(t, k, t0, p, a, i, e, w, istar, zm, dg, ldp, ldw, splimit, lcids, pbids, nsamples, exptimes, es, ms, tae)
@@ -474,15 +579,11 @@ def swmodel_direct_s(t, k, t0, p, a, i, e, w, ldp, istar, ze, zm, ng, splimit, l
 @njit(fastmath=True)
 def swmodel_interpolated_s(t, k, t0, p, a, i, e, w, ldp, istar, weights, zm, dk, k0, dg, splimit,
                            lcids, pbids, nsamples, exptimes, es, ms, tae, parallel):
-    k = atleast_1d(k)
-    npb = ldp.shape[1]
     nk = (k[0] - k0) / dk
-    ik = int(floor(nk))
+    ik = int(nk)
     ak = nk - ik
 
-    ldw = zeros((npb, weights.shape[1]))
-    for ipb in range(npb):
-        ldw[ipb] = (1.0 - ak) * dot(weights[ik], ldp[0,ipb]) + ak * dot(weights[ik + 1], ldp[0,ipb])
+    ldw = dot(ldp[0], ((1.0 - ak) * weights[ik] + ak * weights[ik + 1]).T)
 
     if parallel:
         return _eval_s_parallel(t, k, t0, p, a, i, e, w, istar, zm, dg, ldp, ldw, splimit, lcids, pbids, nsamples, exptimes, es, ms, tae)
@@ -495,43 +596,57 @@ def swmodel_direct_v(t, k, t0, p, a, i, e, w, ldp, istar, ze, ng,
                      lcids, pbids, nsamples, exptimes, npb, es, ms, tae):
     npv = k.shape[0]
     npt = t.size
-    ldp = atleast_3d(ldp)
 
     if ldp.shape[0] != npv or ldp.shape[1] != npb:
         raise ValueError(f"The limb darkening profile array should have a shape [npv,npb,ng]")
 
-    t0, p, a, i = atleast_1d(t0), atleast_1d(p), atleast_1d(a), atleast_1d(i)
-
     flux = zeros((npv, npt))
+    ldw_buf = zeros((npv, npb, ng))
+    inv_opk = 1.0 / (1.0 + k)
+    inv_istar = 1.0 / istar
+
+    # The weights depend only on the radius ratio, which is often shared by all the
+    # parameter vectors, so we calculate them once for the first radius ratio and
+    # recalculate them inside the loop only for the vectors with a different one.
+    # The grazing parameter grid, and so dg, does not depend on the radius ratio.
+    gs, dg, weights0 = calculate_weights_2d(k[0, 0], ze, ng)
     for ipv in prange(npv):
-        gs, dg, weights = calculate_weights_2d(k[ipv,0], ze, ng)
+        if k[ipv, 0] == k[0, 0]:
+            weights = weights0
+        else:
+            weights = calculate_weights_2d(k[ipv, 0], ze, ng)[2]
 
-        ldw = zeros((npb, ng))
         for ipb in range(npb):
-            ldw[ipb] = dot(weights, ldp[ipv, ipb])
+            ldw_buf[ipv, ipb] = dot(weights, ldp[ipv, ipb])
 
-        for j in range(npt):
-            ilc = lcids[j]
-            ipb = pbids[ilc]
+    # The model is evaluated in a single parallel loop over all the (ipv, j) pairs so
+    # that all the threads have work also when the number of parameter vectors is small.
+    for ij in prange(npv * npt):
+        ipv = ij // npt
+        j = ij - ipv * npt
+        ilc = lcids[j]
+        ipb = pbids[ilc]
 
-            if k.shape[1] == 1:
-                _k = k[ipv, 0]
-            else:
-                _k = k[ipv, ipb]
+        ikpb = 0 if k.shape[1] == 1 else ipb
+        _k = k[ipv, ikpb]
+        k2 = _k * _k
 
-            if isnan(_k) or isnan(a[ipv]) or isnan(i[ipv]):
-                flux[ipv, j] = inf
-            else:
-                for isample in range(1, nsamples[ilc] + 1):
-                    time_offset = exptimes[ilc] * ((isample - 0.5) / nsamples[ilc] - 0.5)
-                    z = z_ip_s(t[j] + time_offset, t0[ipv], p[ipv], a[ipv], i[ipv], e[ipv], w[ipv], es, ms, tae)
-                    if z > 1.0 + _k:
-                        flux[ipv, j] += 1.
-                    else:
-                        iplanet = lerp(z / (1. + _k), dg, ldw[ipb])
-                        aplanet = circle_circle_intersection_area(1.0, _k, z)
-                        flux[ipv, j] += (istar[ipv, ipb] - iplanet * aplanet) / istar[ipv, ipb]
-                flux[ipv, j] /= nsamples[ilc]
+        if isnan(_k) or isnan(a[ipv]) or isnan(i[ipv]):
+            flux[ipv, j] = inf
+        else:
+            ldw = ldw_buf[ipv, ipb]
+            inv_ns = 1.0 / nsamples[ilc]
+            for isample in range(1, nsamples[ilc] + 1):
+                time_offset = exptimes[ilc] * ((isample - 0.5) * inv_ns - 0.5)
+                z = z_ip_s(t[j] + time_offset, t0[ipv], p[ipv], a[ipv], i[ipv], e[ipv], w[ipv], es, ms, tae)
+                g = z * inv_opk[ipv, ikpb]
+                if copysign(1., z) < 0.0 or g >= 1.0:
+                    flux[ipv, j] += 1.
+                else:
+                    iplanet = lerp(g, dg, ldw)
+                    aplanet = circle_circle_intersection_area_kz(_k, k2, z)
+                    flux[ipv, j] += (istar[ipv, ipb] - iplanet * aplanet) * inv_istar[ipv, ipb]
+            flux[ipv, j] *= inv_ns
     return flux
 
 @njit(parallel=True, fastmath=False)
@@ -539,45 +654,49 @@ def swmodel_interpolated_v(t, k, t0, p, a, i, e, w, ldp, istar, weights, dk, k0,
                            lcids, pbids, nsamples, exptimes, npb, es, ms, tae):
     npv = k.shape[0]
     npt = t.size
-    ldp = atleast_3d(ldp)
     ng = weights.shape[1]
 
     if ldp.shape[0] != npv or ldp.shape[1] != npb:
         raise ValueError(f"The limb darkening profile array should have a shape [npv,npb,ng]")
 
-    t0, p, a, i = atleast_1d(t0), atleast_1d(p), atleast_1d(a), atleast_1d(i)
-
     flux = zeros((npv, npt))
+    ldw_buf = zeros((npv, npb, ng))
+    inv_opk = 1.0 / (1.0 + k)
+    inv_istar = 1.0 / istar
     for ipv in prange(npv):
-        ldw = zeros((npb, ng))
-
         nk = (k[ipv, 0] - k0) / dk
-        ik = int(floor(nk))
+        ik = int(nk)
         ak = nk - ik
 
         for ipb in range(npb):
-            ldw[ipb] = (1.0 - ak) * dot(weights[ik], ldp[ipv, ipb]) + ak * dot(weights[ik + 1], ldp[ipv, ipb])
+            ldw_buf[ipv, ipb] = (1.0 - ak) * dot(weights[ik], ldp[ipv, ipb]) + ak * dot(weights[ik + 1], ldp[ipv, ipb])
 
-        for j in range(npt):
-            ilc = lcids[j]
-            ipb = pbids[ilc]
+    # The model is evaluated in a single parallel loop over all the (ipv, j) pairs so
+    # that all the threads have work also when the number of parameter vectors is small.
+    for ij in prange(npv * npt):
+        ipv = ij // npt
+        j = ij - ipv * npt
+        ilc = lcids[j]
+        ipb = pbids[ilc]
 
-            if k.shape[1] == 1:
-                _k = k[ipv, 0]
-            else:
-                _k = k[ipv, ipb]
+        ikpb = 0 if k.shape[1] == 1 else ipb
+        _k = k[ipv, ikpb]
+        k2 = _k * _k
 
-            if isnan(_k) or isnan(a[ipv]) or isnan(i[ipv]):
-                flux[ipv, j] = inf
-            else:
-                for isample in range(1, nsamples[ilc] + 1):
-                    time_offset = exptimes[ilc] * ((isample - 0.5) / nsamples[ilc] - 0.5)
-                    z = z_ip_s(t[j] + time_offset, t0[ipv], p[ipv], a[ipv], i[ipv], e[ipv], w[ipv], es, ms, tae)
-                    if z > 1.0 + _k:
-                        flux[ipv, j] += 1.
-                    else:
-                        iplanet = lerp(z / (1. + _k), dg, ldw[ipb])
-                        aplanet = circle_circle_intersection_area(1.0, _k, z)
-                        flux[ipv, j] += (istar[ipv, ipb] - iplanet * aplanet) / istar[ipv, ipb]
-                flux[ipv, j] /= nsamples[ilc]
-    return flux
\ No newline at end of file
+        if isnan(_k) or isnan(a[ipv]) or isnan(i[ipv]):
+            flux[ipv, j] = inf
+        else:
+            ldw = ldw_buf[ipv, ipb]
+            inv_ns = 1.0 / nsamples[ilc]
+            for isample in range(1, nsamples[ilc] + 1):
+                time_offset = exptimes[ilc] * ((isample - 0.5) * inv_ns - 0.5)
+                z = z_ip_s(t[j] + time_offset, t0[ipv], p[ipv], a[ipv], i[ipv], e[ipv], w[ipv], es, ms, tae)
+                g = z * inv_opk[ipv, ikpb]
+                if copysign(1., z) < 0.0 or g >= 1.0:
+                    flux[ipv, j] += 1.
+                else:
+                    iplanet = lerp(g, dg, ldw)
+                    aplanet = circle_circle_intersection_area_kz(_k, k2, z)
+                    flux[ipv, j] += (istar[ipv, ipb] - iplanet * aplanet) * inv_istar[ipv, ipb]
+            flux[ipv, j] *= inv_ns
+    return flux
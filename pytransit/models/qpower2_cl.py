@@ -33,6 +33,8 @@ class QPower2ModelCL(TransitModel):
     """
     """
 
+    returns_buffer_view = True
+
     def __init__(self, cl_ctx=None, cl_queue=None) -> None:
         super().__init__()
 
@@ -273,7 +273,7 @@ class SwiftModel(TransitModel):
         # Parameter population branch
         # ---------------------------
         else:
-            k, t0, p, a, i = asarray(k), asarray(t0), asarray(p), asarray(a), asarray(i)
+            k, t0, p, a, i = atleast_1d(k), atleast_1d(t0), atleast_1d(p), atleast_1d(a), atleast_1d(i)
 
             if k.ndim == 1:
                 k = k.reshape((k.size, 1))
@@ -341,7 +341,7 @@ class SwiftModel(TransitModel):
             Modelled flux as a 1D ndarray.
         """
 
-        k = asarray(k)
+        k = atleast_1d(k)
         ldc = asarray(ldc)
 
         if isinstance(self.ldmodel, LDModel):
@@ -48,6 +48,8 @@ class SwiftModelCL(TransitModel):
                 'power-2': ld_power_2,
                 'power-2-pm': ld_power_2_pm}
 
+    returns_buffer_view = True
+
     def __init__(self, ldmodel: Union[str, Callable, Tuple[Callable, Callable]] = 'quadratic',
                  interpolate: bool = False, klims: tuple = (0.005, 0.5), nk: int = 256,
                  nzin: int = 20, nzlimb: int = 20, zcut=0.7, ng: int = 50, parallel: bool = False,
@@ -37,6 +37,9 @@ class TransitModel(object):
     """Exoplanet transit light curve model 
     """
 
+    # True if `evaluate` returns a view into an output buffer that the next call overwrites.
+    returns_buffer_view: bool = False
+
     def __init__(self) -> None:
 
         # Declare the basic arrays
@@ -32,7 +32,7 @@ setup(name='PyTransit',
                 'pytransit.lpf.baselines','pytransit.lpf.loglikelihood'],
       package_data={'':['*.cl'], 'pytransit.contamination':['data/*']},
       install_requires=["numpy", "numba", "scipy", "pandas", "xarray", "tables", "semantic_version"],
-      extras_require={'celerite': ["celerite","pybind11"]},
+      extras_require={'celerite': ["celerite","pybind11"], 'svml': ["icc_rt"]},
       include_package_data=True,
       license='GPLv2',
       classifiers=[
@@ -0,0 +1,139 @@
+#  PyTransit: fast and easy exoplanet transit modelling in Python.
+#  Copyright (C) 2010-2020  Hannu Parviainen
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import unittest
+from types import SimpleNamespace
+from warnings import catch_warnings, simplefilter
+
+from astropy.stats import sigma_clip
+from astropy.utils.exceptions import AstropyUserWarning
+from numpy import linspace, zeros, isfinite, nan, concatenate, cumsum, ones, array, full, log, pi
+from numpy.random import RandomState
+from numpy.testing import assert_array_equal, assert_allclose
+
+from pytransit import QuadraticModel
+from pytransit.lpf.lpf import BaseLPF, sigma_clip_per_lc
+
+
+class BufferedQuadraticModel(QuadraticModel):
+    """Quadratic model returning a view into a persistent output buffer like the OpenCL models do."""
+
+    returns_buffer_view = True
+
+    def evaluate(self, *args, **kwargs):
+        flux = super().evaluate(*args, **kwargs)
+        if getattr(self, 'f', None) is None or self.f.shape != flux.shape:
+            self.f = zeros(flux.shape)
+        self.f[:] = flux
+        return self.f
+
+
+class TestBaseLPF(unittest.TestCase):
+
+    def setUp(self) -> None:
+        rs = RandomState(0)
+        self.times = [linspace(-0.2, 0.2, n) for n in (500, 300, 400)]
+        self.fluxes = [rs.normal(1.0, 1e-3, t.size) for t in self.times]
+
+    def create_lpf(self, **kwargs):
+        return BaseLPF('test', ['pb'], self.times, self.fluxes, **kwargs)
+
+    def test_flux_model_does_not_alias_model_buffer(self):
+        lpf = self.create_lpf(tm=BufferedQuadraticModel())
+        pvp = lpf.create_pv_population(2)
+        f1 = lpf.flux_model(pvp[0])
+        f1c = f1.copy()
+        lpf.flux_model(pvp[1])
+        assert_array_equal(f1, f1c)
+
+    def test_create_pv_population_follows_the_priors(self):
+        rs = RandomState(1)
+        fluxes = [rs.normal(1.0, 3e-5, self.times[0].size)]
+        lpf = BaseLPF('test', ['pb'], self.times[:1], fluxes)
+        pvp = lpf.create_pv_population(50)
+        self.assertTrue(isfinite(lpf.lnprior(pvp)).all())
+        self.assertTrue(((pvp[:, lpf._sl_wn] >= -4) & (pvp[:, lpf._sl_wn] <= 0)).all())
+
+    def test_covariates_are_normalised(self):
+        rs = RandomState(2)
+        covariates = [array([rs.normal(5.0, 2.0, t.size), full(t.size, 3.0)]).T for t in self.times]
+        lpf = self.create_lpf(covariates=covariates)
+        for cv in lpf.covariates:
+            assert_allclose(cv.mean(0), 0.0, atol=1e-12)
+            assert_allclose(cv[:, 0].std(), 1.0)
+            assert_array_equal(cv[:, 1], 0.0)
+
+    def lnlikelihood_reference(self, lpf, pv):
+        fmodel = lpf.flux_model(pv)
+        lnl = 0.0
+        for i, sl in enumerate(lpf.lcslices):
+            e = 10**pv[lpf._start_wn + lpf.noise_ids[i]]
+            r = lpf.ofluxa[sl] - fmodel[sl]
+            lnl += -r.size*(log(e) + 0.5*log(2*pi)) - 0.5*(r**2).sum()/e**2
+        return lnl
+
+    def test_remove_transits(self):
+        lpf = self.create_lpf()
+        lpf.remove_transits([1])
+        self.assertEqual(lpf.nlc, 2)
+        self.assertEqual(lpf.ofluxa.size, 900)
+        self.assertIn('wn_loge_0', lpf.ps.names)
+        self.assertEqual(len(lpf.ps), lpf._sl_wn.stop)
+        pv = lpf.create_pv_population(1)[0]
+        assert_allclose(lpf.lnlikelihood(pv), self.lnlikelihood_reference(lpf, pv))
+
+    def test_remove_outliers(self):
+        self.fluxes[2][100] = 1.5
+        lpf = self.create_lpf()
+        pv = lpf.create_pv_population(1)[0]
+        pv[lpf.ps.names.index('b')] = 2.0
+        lpf.de = SimpleNamespace(minimum_location=pv)
+        lpf.remove_outliers()
+        self.assertEqual(lpf.ofluxa.size, 1199)
+        self.assertEqual(lpf.lcslices[2], slice(800, 1199))
+        pv = lpf.create_pv_population(1)[0]
+        assert_allclose(lpf.lnlikelihood(pv), self.lnlikelihood_reference(lpf, pv))
+
+    def test_remove_transits_remaps_noise_ids(self):
+        lpf = self.create_lpf(wnids=[0, 1, 1])
+        lpf.remove_transits([0])
+        assert_array_equal(lpf.noise_ids, [0, 0])
+        self.assertIn('wn_loge_0', lpf.ps.names)
+        self.assertNotIn('wn_loge_1', lpf.ps.names)
+        pv = lpf.create_pv_population(1)[0]
+        assert_allclose(lpf.lnlikelihood(pv), self.lnlikelihood_reference(lpf, pv))
+
+
+class TestSigmaClipPerLC(unittest.TestCase):
+
+    def test_matches_astropy(self):
+        rs = RandomState(0)
+        for trial in range(200):
+            sizes = rs.randint(5, 200, size=rs.randint(1, 5))
+            res = [rs.standard_t(2, size=n) for n in sizes]
+            for r in res:
+                r[rs.randint(0, r.size, size=rs.randint(0, 3))] = nan
+            stops = cumsum(sizes)
+            starts = stops - sizes
+            mask = sigma_clip_per_lc(concatenate(res), starts, stops, 3.0, 5, ones(sizes.sum(), bool))
+            with catch_warnings():
+                simplefilter('ignore', AstropyUserWarning)
+                ref = concatenate([~sigma_clip(r, sigma=3.0, maxiters=5).mask for r in res])
+            assert_array_equal(mask, ref)
+
+
+if __name__ == '__main__':
+    unittest.main()
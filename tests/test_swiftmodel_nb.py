@@ -0,0 +1,136 @@
+#  PyTransit: fast and easy exoplanet transit modelling in Python.
+#  Copyright (C) 2010-2020  Hannu Parviainen
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import unittest
+from math import acos, pi
+from numpy import array, linspace, interp, sqrt, isnan, sort, zeros
+from numpy.random import RandomState
+from numpy.testing import assert_almost_equal, assert_allclose
+
+from pytransit.models.swiftmodel import SwiftModel
+from pytransit.models.numba.swiftmodel import create_z_grid, interpolate_limb_darkening_s, \
+    interpolate_limb_darkening_v, circle_circle_intersection_area, circle_circle_intersection_area_kz, \
+    calculate_weights_2d, calculate_weights_3d
+
+
+def circle_circle_intersection_area_ref(r1, r2, b):
+    """Reference circle-circle intersection area using the arccos formula."""
+    if r1 < b - r2:
+        return 0.0
+    elif r1 >= b + r2:
+        return pi * r2 ** 2
+    elif b - r2 <= -r1:
+        return pi * r1 ** 2
+    else:
+        return (r2 ** 2 * acos(min(max((b ** 2 + r2 ** 2 - r1 ** 2) / (2 * b * r2), -1.0), 1.0)) +
+                r1 ** 2 * acos(min(max((b ** 2 + r1 ** 2 - r2 ** 2) / (2 * b * r1), -1.0), 1.0)) -
+                0.5 * sqrt(max((-b + r2 + r1) * (b + r2 - r1) * (b - r2 + r1) * (b + r2 + r1), 0.0)))
+
+
+def calculate_weights_2d_ref(k, ze, ng):
+    """Reference limb darkening weights evaluating the intersection area for every annulus."""
+    gs = linspace(0, 1 - 1e-7, ng)
+    weights = zeros((ng, ze.size))
+    for ig in range(ng):
+        b = gs[ig] * (1.0 + k)
+        a0 = 0.0
+        for i in range(ze.size):
+            a1 = circle_circle_intersection_area_ref(ze[i], k, b)
+            weights[ig, i] = a1 - a0
+            a0 = a1
+        weights[ig] /= weights[ig].sum()
+    return weights
+
+
+class TestSwiftModelNB(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.ze, self.zm = create_z_grid(0.7, 20, 20)
+        self.ldp = 1.0 - 0.3 * (1.0 - sqrt(1.0 - self.zm**2))
+
+    def test_interpolate_limb_darkening_s(self):
+        zs = RandomState(0).uniform(0.0, self.zm[-1], 200)
+        for z in zs:
+            assert_almost_equal(interpolate_limb_darkening_s(z, self.zm, self.ldp), interp(z, self.zm, self.ldp))
+        assert_almost_equal(interpolate_limb_darkening_s(self.zm[-1], self.zm, self.ldp), self.ldp[-1])
+        assert_almost_equal(interpolate_limb_darkening_s(2.0, self.zm, self.ldp), self.ldp[-1])
+        assert isnan(interpolate_limb_darkening_s(-0.1, self.zm, self.ldp))
+
+    def test_interpolate_limb_darkening_v(self):
+        zs = RandomState(0).uniform(0.0, self.zm[-1], 200)
+        assert_almost_equal(interpolate_limb_darkening_v(zs, self.zm, self.ldp), interp(zs, self.zm, self.ldp))
+        assert_almost_equal(interpolate_limb_darkening_v(sort(zs), self.zm, self.ldp),
+                            interp(sort(zs), self.zm, self.ldp))
+        assert_almost_equal(interpolate_limb_darkening_v(self.zm, self.zm, self.ldp), self.ldp)
+
+        ld = interpolate_limb_darkening_v(array([-0.1, 0.5, 2.0]), self.zm, self.ldp)
+        assert isnan(ld[0])
+        assert_almost_equal(ld[1:], [interp(0.5, self.zm, self.ldp), self.ldp[-1]])
+
+    def test_circle_circle_intersection_area(self):
+        rs = RandomState(0)
+        for r1, r2, b in zip(rs.uniform(0.01, 1.0, 2000), rs.uniform(0.01, 1.0, 2000), rs.uniform(0.0, 2.0, 2000)):
+            assert_allclose(circle_circle_intersection_area(r1, r2, b),
+                            circle_circle_intersection_area_ref(r1, r2, b), rtol=1e-10, atol=1e-13)
+        for b in linspace(0.0, 1.2, 1201):
+            assert_allclose(circle_circle_intersection_area(1.0, 0.1, b),
+                            circle_circle_intersection_area_ref(1.0, 0.1, b), rtol=1e-10, atol=1e-13)
+
+    def test_circle_circle_intersection_area_kz(self):
+        for k in (0.001, 0.05, 0.1, 0.3, 1.0, 1.5):
+            for z in linspace(0.0, 2.6, 2601):
+                assert_allclose(circle_circle_intersection_area_kz(k, k * k, z),
+                                circle_circle_intersection_area(1.0, k, z), rtol=1e-12, atol=1e-15)
+
+    def test_calculate_weights_2d(self):
+        for k in (0.01, 0.05, 0.1, 0.3, 0.7):
+            gs, dg, weights = calculate_weights_2d(k, self.ze, 50)
+            assert_allclose(dg, gs[1] - gs[0])
+            assert_allclose(weights, calculate_weights_2d_ref(k, self.ze, 50), rtol=0, atol=1e-9)
+
+    def test_calculate_weights_3d(self):
+        nk, k0, k1 = 5, 0.05, 0.3
+        dk, dg, weights = calculate_weights_3d(nk, k0, k1, self.ze, 50)
+        for ik, k in enumerate(linspace(k0, k1, nk)):
+            assert_allclose(weights[ik], calculate_weights_2d(k, self.ze, 50)[2], rtol=0, atol=1e-15)
+
+
+class TestSwiftModelSecondaryEclipse(unittest.TestCase):
+    """The swift model should not show a transit when the planet is behind the star."""
+
+    def setUp(self) -> None:
+        self.time = linspace(2.3, 2.7, 401)
+        self.ldc = array([[0.3, 0.1]])
+
+    def test_evaluate_ps(self):
+        for interpolate in (False, True):
+            for nsamples in (1, 3):
+                for k in (0.01, 0.1):
+                    tm = SwiftModel(interpolate=interpolate)
+                    tm.set_data(self.time, nsamples=nsamples, exptimes=0.02)
+                    assert_allclose(tm.evaluate_ps(k, self.ldc, 0.0, 5.0, 8.0, 0.5 * pi), 1.0, rtol=0, atol=1e-12)
+
+    def test_evaluate_pv(self):
+        for interpolate in (False, True):
+            tm = SwiftModel(interpolate=interpolate)
+            tm.set_data(self.time, nsamples=3, exptimes=0.02)
+            flux = tm.evaluate([0.1, 0.12], array([self.ldc, self.ldc]), [0.0, 0.0], [5.0, 5.0], [8.0, 8.0],
+                               [0.5 * pi, 0.5 * pi])
+            assert_allclose(flux, 1.0, rtol=0, atol=1e-12)
+
+
+if __name__ == '__main__':
+    unittest.main()